@@ -0,0 +1,23 @@
+import asyncio
+from tinkoff_client import AsyncTinkoffClient
+
+
+async def main():
+    async with AsyncTinkoffClient("TOKEN.txt") as cli:
+        account = 'Algo-Trade'
+
+        # Независимые запросы выполняются параллельно
+        sber, gazp = await asyncio.gather(
+            cli.market.get_current_price("SBER"),
+            cli.market.get_current_price("GAZP"),
+        )
+        print(sber, gazp)
+
+        order_ids = await cli.trade.place_orders([
+            {"account": account, "ticker": "SBER", "quantity": 1, "direction": "BUY", "price": 306},
+            {"account": account, "ticker": "GAZP", "quantity": 1, "direction": "BUY"},
+        ])
+        print(order_ids)
+
+
+asyncio.run(main())
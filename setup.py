@@ -5,9 +5,13 @@ setup(
     version="1.0.0",                   
     packages=find_packages(),          
     install_requires=[              
+        "numpy",
         "pandas",
         "tinkoff-invest>=0.2.0-beta108",     
     ],
+    extras_require={
+        "arrow": ["pyarrow"],
+    },
     python_requires=">=3.10",         
     description="Python client for Tinkoff Invest API",
     long_description=open("README.md", encoding="utf-8").read(),
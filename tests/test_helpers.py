@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("tinkoff.invest")
+
+from tinkoff.invest import Quotation
+from tinkoff.invest.utils import decimal_to_quotation
+
+from tinkoff_client.tinkoff_client import MarketDataService, RateLimiter, TinkoffClient, TradeService
+
+
+@pytest.mark.parametrize("price", [1, 306, 0.1, 0.3, 123.45, 99.999999999, 1e-9, 12345.678901234, -2.5])
+def test_to_quotation_matches_decimal_to_quotation(price):
+    expected = decimal_to_quotation(Decimal(str(price)))
+    assert TradeService._to_quotation(price) == expected
+
+
+@pytest.mark.parametrize("price", ["0.1", "306.55", "1.000000001", "42"])
+def test_to_quotation_decimal_input(price):
+    assert TradeService._to_quotation(Decimal(price)) == decimal_to_quotation(Decimal(price))
+
+
+def test_price_to_quotation_cache_returns_same_values():
+    first = TradeService._to_quotation(271.35)
+    second = TradeService._to_quotation(271.35)
+    assert first == second == TradeService._price_to_quotation("271.35")
+    assert TradeService._price_to_quotation.cache_info().hits >= 1
+
+
+def _candles(*times):
+    return [SimpleNamespace(time=t) for t in times]
+
+
+def test_dedup_chunks_drops_boundary_overlap():
+    chunks = [_candles(1, 2, 3), _candles(3, 4), _candles(), _candles(4, 5, 6)]
+    result = [[c.time for c in chunk] for chunk in MarketDataService._dedup_chunks(chunks)]
+    assert result == [[1, 2, 3], [4], [5, 6]]
+
+
+def test_history_ranges_split_by_max_range():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=2, hours=12)
+    ranges = MarketDataService._history_ranges(start, end, "1m")
+    assert ranges[0][0] == start
+    assert ranges[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert all(to - frm <= MarketDataService._MAX_RANGE["1m"] for frm, to in ranges)
+    assert len(ranges) == 3
+
+
+def test_history_ranges_empty_and_invalid():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert MarketDataService._history_ranges(start, start, "1d") == []
+    with pytest.raises(ValueError):
+        MarketDataService._history_ranges(start, start + timedelta(days=1), "2m")
+
+
+def _level(units, nano=0):
+    return SimpleNamespace(price=Quotation(units=units, nano=nano))
+
+
+def test_order_book_price_prefers_last_price():
+    book = SimpleNamespace(last_price=Quotation(units=10, nano=500_000_000), bids=[_level(9)], asks=[_level(11)])
+    assert MarketDataService._order_book_price(book, "SBER") == Decimal("10.5")
+
+
+def test_order_book_price_falls_back_to_available_sides():
+    both = SimpleNamespace(last_price=None, bids=[_level(9)], asks=[_level(10)])
+    bid_only = SimpleNamespace(last_price=None, bids=[_level(9)], asks=[])
+    ask_only = SimpleNamespace(last_price=None, bids=[], asks=[_level(10)])
+    assert MarketDataService._order_book_price(both, "SBER") == Decimal("9.5")
+    assert MarketDataService._order_book_price(bid_only, "SBER") == Decimal(9)
+    assert MarketDataService._order_book_price(ask_only, "SBER") == Decimal(10)
+
+
+def test_order_book_price_empty_book():
+    book = SimpleNamespace(last_price=None, bids=[], asks=[])
+    with pytest.raises(ValueError):
+        MarketDataService._order_book_price(book, "SBER")
+
+
+def test_rate_limiter_allows_burst_then_waits():
+    limiter = RateLimiter(2)
+    assert limiter._try_acquire() == 0.0
+    assert limiter._try_acquire() == 0.0
+    assert limiter._try_acquire() > 0
+
+
+def test_load_token_raw_value():
+    assert TinkoffClient._load_token("t.raw-token") == "t.raw-token"
+
+
+def test_load_token_reads_first_line(tmp_path):
+    token_file = tmp_path / "TOKEN.txt"
+    token_file.write_text("t.from-file\nsecond line\n")
+    assert TinkoffClient._load_token(str(token_file)) == "t.from-file"
+
+
+def test_load_token_missing_and_empty_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TinkoffClient._load_token(str(tmp_path / "missing.txt"))
+    empty = tmp_path / "empty.txt"
+    empty.write_text("\n")
+    with pytest.raises(ValueError):
+        TinkoffClient._load_token(str(empty))
+
+
+def test_load_token_from_env(monkeypatch):
+    monkeypatch.setenv(TinkoffClient._TOKEN_ENV, "t.from-env")
+    assert TinkoffClient._load_token(None) == "t.from-env"
+    monkeypatch.delenv(TinkoffClient._TOKEN_ENV)
+    with pytest.raises(ValueError):
+        TinkoffClient._load_token(None)
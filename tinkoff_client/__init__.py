@@ -1 +1,4 @@
-from .tinkoff_client import TinkoffClient
\ No newline at end of file
+from .tinkoff_client import TinkoffClient
+from .async_client import AsyncTinkoffClient
+
+__all__ = ["TinkoffClient", "AsyncTinkoffClient"]
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+from functools import partialmethod
+from datetime import datetime
+from decimal import Decimal
+from tinkoff.invest import AsyncClient, InstrumentStatus
+from tinkoff.invest import OrderDirection, OrderType
+from tinkoff.invest import StopOrderExpirationType
+from tinkoff.invest.async_services import AsyncServices
+from tinkoff.invest.utils import quotation_to_decimal
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+  import pandas as pd
+
+from .tinkoff_client import TinkoffClient, MarketDataService, TradeService, RateLimiter
+
+
+class AsyncTinkoffClient:
+
+    def __init__(self, token_file: str | None = None, rps_limits: dict[str, float] | None = None):
+        self.token = TinkoffClient._load_token(token_file)
+        self._client_cm = AsyncClient(self.token, options=TinkoffClient._CHANNEL_OPTIONS)
+        self.client = None
+
+        rps_limits = rps_limits or {}
+        self._market_rl = RateLimiter(rps_limits.get("market_data", MarketDataService._MARKET_DATA_RPS))
+        self._orders_rl = RateLimiter(rps_limits.get("orders", TradeService._ORDERS_RPS))
+
+    async def open(self):
+        self.client = await self._client_cm.__aenter__()
+
+        self.account = AsyncAccountService(self.client)
+        self.market = AsyncMarketDataService(self.client, self._market_rl)
+        self.trade = AsyncTradeService(self.client, self.account, self.market, self._orders_rl)
+        return self
+
+    async def close(self):
+        await self._client_cm.__aexit__(None, None, None)
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AsyncAccountService:
+  def __init__(self, client: AsyncServices):
+    self.client = client
+    self._account_id_by_name: dict[str, str] | None = None
+
+  async def get_account_id(self, name: str) -> str:
+    if self._account_id_by_name is None:
+      accounts = (await self.client.users.get_accounts()).accounts
+      self._account_id_by_name = {acc.name: acc.id for acc in accounts}
+    account_id = self._account_id_by_name.get(name)
+    if account_id is None:
+      raise ValueError(f"Счет с именем '{name}' не найден")
+    return account_id
+
+
+class AsyncMarketDataService:
+
+  def __init__(self, client: AsyncServices, rate_limiter: RateLimiter | None = None):
+    self.client = client
+    self._rate_limiter = rate_limiter or RateLimiter(MarketDataService._MARKET_DATA_RPS)
+    self._figi_by_ticker: dict[str, dict[str, str]] = {kind: {} for kind in MarketDataService._INSTRUMENT_KINDS}
+    self._instruments_loaded = False
+    self._instruments_lock = asyncio.Lock()
+
+  async def _load_instruments(self):
+    async with self._instruments_lock:
+      if self._instruments_loaded:
+        return
+      shares, bonds = await asyncio.gather(
+        self.client.instruments.shares(instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE),
+        self.client.instruments.bonds(instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE),
+      )
+      self._figi_by_ticker["share"] = {i.ticker.upper(): i.figi for i in shares.instruments}
+      self._figi_by_ticker["bond"] = {i.ticker.upper(): i.figi for i in bonds.instruments}
+      self._instruments_loaded = True
+
+  async def get_figi(self, ticker: str, instrument_type: str = "share") -> str:
+    ticker = ticker.upper()
+    instrument_type = instrument_type.lower()
+    if not self._instruments_loaded:
+      await self._load_instruments()
+    figi = self._figi_by_ticker.get(instrument_type, {}).get(ticker)
+    if figi is None and instrument_type in MarketDataService._INSTRUMENT_KINDS:
+      figi = await self._find_figi(ticker, instrument_type)
+    if not figi:
+      raise ValueError(f"FIGI для '{ticker}' с типом '{instrument_type}' не найдено")
+    return figi
+
+  async def _find_figi(self, ticker: str, instrument_type: str) -> str | None:
+    kind = MarketDataService._INSTRUMENT_KINDS[instrument_type]
+    instruments = (await self.client.instruments.find_instrument(query=ticker, instrument_kind=kind)).instruments
+    inst = next((i for i in instruments if i.ticker.upper() == ticker and i.instrument_kind == kind), None)
+    if inst is None:
+      return None
+    self._figi_by_ticker[instrument_type][ticker] = inst.figi
+    return inst.figi
+
+  async def get_current_price(self, ticker: str) -> Decimal:
+    figi = await self.get_figi(ticker)
+    orderbook = await self.client.market_data.get_order_book(figi=figi, depth=1)
+    return MarketDataService._order_book_price(orderbook, ticker)
+
+  async def get_history(self, ticker: str, from_date: datetime,
+    to_date: datetime, interval: str = "1d") -> pd.DataFrame:
+
+    figi = await self.get_figi(ticker)
+    ranges = MarketDataService._history_ranges(from_date, to_date, interval)
+    ti_interval = MarketDataService._INTERVAL_MAP[interval]
+
+    async def fetch(cur_from, cur_to):
+      await self._rate_limiter.acquire_async()
+      resp = await self.client.market_data.get_candles(
+        figi=figi,
+        from_=cur_from,
+        to=cur_to,
+        interval=ti_interval,
+      )
+      return resp.candles
+
+    chunks = await asyncio.gather(*(fetch(cur_from, cur_to) for cur_from, cur_to in ranges))
+
+    candles = [c for chunk in MarketDataService._dedup_chunks(chunks) for c in chunk]
+    return MarketDataService._candles_to_frame(candles)
+
+
+class AsyncTradeService:
+
+  _DIRECTION_MAP = {
+    "BUY": OrderDirection.ORDER_DIRECTION_BUY,
+    "SELL": OrderDirection.ORDER_DIRECTION_SELL,
+  }
+
+  def __init__(self, client: AsyncServices, account_service: AsyncAccountService, market_data_service: AsyncMarketDataService,
+    rate_limiter: RateLimiter | None = None):
+    self.client = client
+    self.account_service = account_service
+    self.market_data_service = market_data_service
+    self._rate_limiter = rate_limiter or RateLimiter(TradeService._ORDERS_RPS)
+
+  async def resolve(self, account: str, ticker: str) -> tuple[str, str]:
+    return tuple(await asyncio.gather(
+      self.account_service.get_account_id(account),
+      self.market_data_service.get_figi(ticker),
+    ))
+
+  async def _place_order(self, account: str, figi: str,
+    quantity: int, direction: OrderDirection,
+    price: float | None):
+
+    TradeService._check_order(quantity, price)
+
+    order_type = (
+      OrderType.ORDER_TYPE_MARKET
+      if price is None
+      else OrderType.ORDER_TYPE_LIMIT
+    )
+
+    price_q = None if price is None else TradeService._to_quotation(price)
+
+    await self._rate_limiter.acquire_async()
+    return await self.client.orders.post_order(
+      figi=figi,
+      quantity=quantity,
+      account_id=account,
+      direction=direction,
+      order_type=order_type,
+      price=price_q,
+    )
+
+  async def buy(self, account: str, ticker: str, quantity: int, price: float = None):
+    account_id, figi = await self.resolve(account, ticker)
+    order = await self._place_order(account_id, figi, quantity, OrderDirection.ORDER_DIRECTION_BUY, price)
+    return order.order_id
+
+  async def sell(self, account: str, ticker: str, quantity: int, price: float = None):
+    account_id, figi = await self.resolve(account, ticker)
+    order = await self._place_order(account_id, figi, quantity, OrderDirection.ORDER_DIRECTION_SELL, price)
+    return order.order_id
+
+  async def get_order_state(self, account: str, order_id: str) -> dict:
+    account_id = await self.account_service.get_account_id(account)
+    await self._rate_limiter.acquire_async()
+    state = await self.client.orders.get_order_state(
+      account_id=account_id,
+      order_id=order_id
+    )
+    return {
+      "order_id": order_id,
+      "status": state.execution_report_status.name,
+      "executed_lots": state.lots_executed,
+      "price": (
+        quotation_to_decimal(state.executed_order_price)
+        if state.executed_order_price else None
+      )
+    }
+
+  async def get_order_states(self, account: str, order_ids: list[str]) -> list[dict]:
+    await self.account_service.get_account_id(account)
+    return list(await asyncio.gather(*(self.get_order_state(account, order_id) for order_id in order_ids)))
+
+  async def place_orders(self, specs: list[dict]) -> list[str | Exception]:
+    TradeService._check_specs(specs)
+    accounts = list({s["account"] for s in specs})
+    tickers = list({s["ticker"] for s in specs})
+    account_ids = await asyncio.gather(*(self.account_service.get_account_id(a) for a in accounts))
+    figis = await asyncio.gather(*(self.market_data_service.get_figi(t) for t in tickers))
+    account_id_by_name = dict(zip(accounts, account_ids))
+    figi_by_ticker = dict(zip(tickers, figis))
+
+    orders = await asyncio.gather(*(
+      self._place_order(
+        account=account_id_by_name[s["account"]],
+        figi=figi_by_ticker[s["ticker"]],
+        quantity=s["quantity"],
+        direction=self._DIRECTION_MAP[s["direction"].upper()],
+        price=s.get("price"),
+      )
+      for s in specs
+    ), return_exceptions=True)
+    return [order if isinstance(order, Exception) else order.order_id for order in orders]
+
+  async def _place_stop_order(self, account_id: str, figi: str,
+    quantity: int, stop_price: float, exec_price: float,
+    direction: str, order_type: str) -> str:
+    if order_type not in TradeService._STOP_TYPE:
+      raise ValueError("order_type должен быть 'STOP_LOSS' или 'TAKE_PROFIT'")
+
+    await self._rate_limiter.acquire_async()
+    resp = await self.client.stop_orders.post_stop_order(
+      account_id=account_id,
+      figi=figi,
+      quantity=quantity,
+      stop_price=TradeService._to_quotation(stop_price),
+      price=TradeService._to_quotation(exec_price),
+      direction=TradeService._STOP_DIR[direction],
+      expiration_type=StopOrderExpirationType.STOP_ORDER_EXPIRATION_TYPE_GOOD_TILL_CANCEL,
+      stop_order_type=TradeService._STOP_TYPE[order_type],
+    )
+    return resp.stop_order_id
+
+  async def stop_order(self, account: str, ticker: str, stop_price: float, exec_price: float, quantity: int,
+    *, side: str, kind: str):
+    if (side, kind) not in TradeService._STOP_ORDER_SIDES:
+      raise ValueError("side должен быть 'long' или 'short', kind — 'SL' или 'TP'")
+    direction, order_type = TradeService._STOP_ORDER_SIDES[(side, kind)]
+    account_id, figi = await self.resolve(account, ticker)
+    return await self._place_stop_order(account_id, figi, quantity, stop_price, exec_price, direction, order_type)
+
+  long_stop_loss = partialmethod(stop_order, side="long", kind="SL")
+  long_take_profit = partialmethod(stop_order, side="long", kind="TP")
+  short_stop_loss = partialmethod(stop_order, side="short", kind="SL")
+  short_take_profit = partialmethod(stop_order, side="short", kind="TP")
+
+  async def bracket_order(self, account: str, ticker: str, quantity: int, stop_price: float, take_price: float,
+    entry_price: float | None = None, direction: str = "BUY") -> dict:
+    direction = direction.upper()
+    TradeService._check_bracket(quantity, stop_price, take_price, entry_price, direction)
+    exit_direction = "SELL" if direction == "BUY" else "BUY"
+    account_id, figi = await self.resolve(account, ticker)
+
+    async def place_entry():
+      order = await self._place_order(account_id, figi, quantity, self._DIRECTION_MAP[direction], entry_price)
+      return order.order_id
+
+    results = await asyncio.gather(
+      place_entry(),
+      self._place_stop_order(account_id, figi, quantity, stop_price, stop_price, exit_direction, "STOP_LOSS"),
+      self._place_stop_order(account_id, figi, quantity, take_price, take_price, exit_direction, "TAKE_PROFIT"),
+      return_exceptions=True,
+    )
+    legs = dict(zip(("order_id", "stop_order_id", "tp_order_id"), results))
+    errors = {leg: r for leg, r in legs.items() if isinstance(r, Exception)}
+    placed = {leg: r for leg, r in legs.items() if leg not in errors}
+    if not errors:
+      return placed
+
+    live = await self._cancel_legs(account_id, placed)
+    raise TradeService._bracket_error(errors, live) from next(iter(errors.values()))
+
+  async def _cancel_legs(self, account_id: str, placed: dict) -> dict:
+    live = {}
+    for leg, order_id in placed.items():
+      try:
+        await self._rate_limiter.acquire_async()
+        if leg == "order_id":
+          await self.client.orders.cancel_order(account_id=account_id, order_id=order_id)
+        else:
+          await self.client.stop_orders.cancel_stop_order(account_id=account_id, stop_order_id=order_id)
+      except Exception:
+        live[leg] = order_id
+    return live
@@ -1,62 +1,232 @@
-import pandas as pd
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import os
+import numpy as np
 from pathlib import Path
-from decimal import Decimal
 from datetime import datetime, timedelta
-from tabulate import tabulate
+from decimal import Decimal
+import pickle
+import threading
+import weakref
+import time
+from collections import deque
+from functools import lru_cache, partialmethod
+from itertools import cycle, islice
+from concurrent.futures import ThreadPoolExecutor
 from tinkoff.invest import Client, InstrumentIdType, InstrumentType
-from tinkoff.invest import CandleInterval
-from tinkoff.invest import InstrumentStatus
-from tinkoff.invest import OrderDirection, OrderType
-from tinkoff.invest.utils import quotation_to_decimal, decimal_to_quotation
+from tinkoff.invest import CandleInterval, GetOperationsByCursorRequest
+from tinkoff.invest import InstrumentStatus, LastPriceInstrument
+from tinkoff.invest import OrderDirection, OrderType, Quotation
+from tinkoff.invest.utils import decimal_to_quotation, quotation_to_decimal
 from tinkoff.invest import StopOrderDirection, StopOrderExpirationType, StopOrderType
+from tinkoff.invest.services import Services
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+  import pandas as pd
+
+class RateLimiter:
+
+  def __init__(self, rps: float):
+    self.rps = rps
+    self._tokens = float(rps)
+    self._updated = time.monotonic()
+    self._lock = threading.Lock()
+
+  def _try_acquire(self) -> float:
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = min(self.rps, self._tokens + (now - self._updated) * self.rps)
+      self._updated = now
+      if self._tokens >= 1:
+        self._tokens -= 1
+        return 0.0
+      return (1 - self._tokens) / self.rps
+
+  def acquire(self):
+    while (wait := self._try_acquire()) > 0:
+      time.sleep(wait)
+
+  async def acquire_async(self):
+    while (wait := self._try_acquire()) > 0:
+      await asyncio.sleep(wait)
+
 
 class TinkoffClient:
 
-    def __init__(self, token_file: str):
-        path = Path(token_file)
-        if not path.is_file():
-            raise FileNotFoundError(f"Файл с токеном не найден: {token_file}")
+    __slots__ = (
+        "token", "client", "_channels", "_channel_pool_size", "_closed",
+        "account", "market", "portfolio", "trade", "__weakref__",
+    )
 
-        with open(path, "r") as f:
-            self.token = f.readline().strip()
+    _CLIENTS: dict[tuple[str, int], list] = {}
+    _CLIENTS_LOCK = threading.RLock()
+    _TOKEN_ENV = "TINVEST_TOKEN"
+
+    _RETRY_SERVICES = ("InstrumentsService", "MarketDataService", "OperationsService", "UsersService")
+    _CHANNEL_OPTIONS = [
+        ("grpc.keepalive_time_ms", 20_000),
+        ("grpc.keepalive_timeout_ms", 10_000),
+        ("grpc.http2.max_pings_without_data", 0),
+        ("grpc.enable_retries", 1),
+        ("grpc.service_config", json.dumps({
+            "methodConfig": [{
+                "name": [
+                    {"service": f"tinkoff.public.invest.api.contract.v1.{service}"}
+                    for service in _RETRY_SERVICES
+                ],
+                "retryPolicy": {
+                    "maxAttempts": 3,
+                    "initialBackoff": "0.1s",
+                    "maxBackoff": "1s",
+                    "backoffMultiplier": 2,
+                    "retryableStatusCodes": ["UNAVAILABLE"],
+                },
+            }],
+        })),
+    ]
 
-        if not self.token:
+    def __init__(self, token_file: str | None = None, instruments_cache_ttl: timedelta | None = timedelta(days=1),
+        channel_pool_size: int = 1, rps_limits: dict[str, float] | None = None,
+        dtype_backend: str | None = None):
+        if channel_pool_size < 1:
+            raise ValueError("Размер пула каналов должен быть положительным")
+
+        self.token = self._load_token(token_file)
+
+        self._channel_pool_size = channel_pool_size
+        self._channels = [self._acquire_client(self.token, slot) for slot in range(channel_pool_size)]
+        self.client = self._channels[0]
+        self._closed = False
+
+        rps_limits = rps_limits or {}
+        market_rl = RateLimiter(rps_limits.get("market_data", MarketDataService._MARKET_DATA_RPS))
+        orders_rl = RateLimiter(rps_limits.get("orders", TradeService._ORDERS_RPS))
+
+        self.account = AccountService(self.client)
+        self.market = MarketDataService(self.client, instruments_cache_ttl, self._channels, market_rl, dtype_backend)
+        self.portfolio = PortfolioService(self.client, self.account, self.market)
+        self.trade = TradeService(self.client, self.account, self.market, self._channels, orders_rl)
+
+    @staticmethod
+    def _load_token(token_file: str | None) -> str:
+        if token_file is None:
+            token = os.environ.get(TinkoffClient._TOKEN_ENV, "").strip()
+            if not token:
+                raise ValueError(f"Токен не задан: передайте путь к файлу или установите {TinkoffClient._TOKEN_ENV}")
+            return token
+        if token_file.startswith("t.") and os.sep not in token_file and not Path(token_file).is_file():
+            return token_file
+        return TinkoffClient._read_token_file(os.path.abspath(token_file))
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _read_token_file(token_file: str) -> str:
+        try:
+            token = Path(token_file).read_text(encoding="ascii").split("\n", 1)[0].strip()
+        except (FileNotFoundError, IsADirectoryError):
+            raise FileNotFoundError(f"Файл с токеном не найден: {token_file}") from None
+
+        if not token:
             raise ValueError("Файл с токеном пуст")
-
-        self.account = AccountService(self.token)
-        self.market = MarketDataService(self.token)
-        self.portfolio = PortfolioService(self.token, self.account, self.market)
-        self.trade = TradeService(self.token, self.account, self.market)
+        return token
+
+    @classmethod
+    def _acquire_client(cls, token: str, slot: int = 0) -> Services:
+        with cls._CLIENTS_LOCK:
+            entry = cls._CLIENTS.get((token, slot))
+            if entry is None:
+                client_cm = Client(token, options=cls._CHANNEL_OPTIONS)
+                entry = cls._CLIENTS[(token, slot)] = [client_cm, client_cm.__enter__(), 0]
+            entry[2] += 1
+            return entry[1]
+
+    @classmethod
+    def _release_client(cls, token: str, slot: int = 0):
+        with cls._CLIENTS_LOCK:
+            entry = cls._CLIENTS.get((token, slot))
+            if entry is None:
+                return
+            entry[2] -= 1
+            if entry[2] <= 0:
+                del cls._CLIENTS[(token, slot)]
+                entry[0].__exit__(None, None, None)
+
+    @classmethod
+    def shutdown_all(cls):
+        MarketDataService.stop_all_price_streams()
+        with cls._CLIENTS_LOCK:
+            entries = list(cls._CLIENTS.values())
+            cls._CLIENTS.clear()
+        for client_cm, _, _ in entries:
+            client_cm.__exit__(None, None, None)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.market.stop_price_stream()
+        for slot in range(self._channel_pool_size):
+            self._release_client(self.token, slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+atexit.register(TinkoffClient.shutdown_all)
 
 
 class AccountService:
-  def __init__(self, token: str):
-    self.token = token
+  def __init__(self, client: Services):
+    self.client = client
+    self._account_id_by_name: dict[str, str] | None = None
+    self._lock = threading.RLock()
+
+  def _list_accounts(self):
+    return self.client.users.get_accounts().accounts
 
   def get_accounts(self) -> pd.DataFrame:
-    rows = []
-    with Client(self.token) as client:
-      accounts = client.users.get_accounts().accounts
-      for acc in accounts:
-        portfolio = client.operations.get_portfolio(account_id=acc.id)
-        balance = (
-          float(portfolio.total_amount_portfolio.units)
-          + float(portfolio.total_amount_portfolio.nano) / 1e9
-        )
-        rows.append({
-          "ID": acc.id,
-          "NAME": acc.name,
-          "OPENED_AT": acc.opened_date.date() if acc.opened_date else None,
-          "BALANCE_RUB": balance
-        })
-    return pd.DataFrame(rows)
+    import pandas as pd
+    ids, names, opened_dates, balances = [], [], [], []
+    accounts = self._list_accounts()
+    with ThreadPoolExecutor(max_workers=max(len(accounts), 1)) as executor:
+      portfolios = list(executor.map(
+        lambda acc: self.client.operations.get_portfolio(account_id=acc.id),
+        accounts,
+      ))
+    for acc, portfolio in zip(accounts, portfolios):
+      balance = (
+        float(portfolio.total_amount_portfolio.units)
+        + float(portfolio.total_amount_portfolio.nano) / 1e9
+      )
+      ids.append(acc.id)
+      names.append(acc.name)
+      opened_dates.append(acc.opened_date.date() if acc.opened_date else None)
+      balances.append(balance)
+    with self._lock:
+      self._account_id_by_name = dict(zip(names, ids))
+    return pd.DataFrame({
+      "ID": ids,
+      "NAME": names,
+      "OPENED_AT": opened_dates,
+      "BALANCE_RUB": np.asarray(balances, dtype="float64"),
+    })
 
   def get_account_id(self, name: str) -> str:
-    accounts = self.get_accounts()
-    match = accounts[accounts["NAME"] == name]
-    if match.empty:
+    if self._account_id_by_name is None:
+      with self._lock:
+        if self._account_id_by_name is None:
+          self._account_id_by_name = {acc.name: acc.id for acc in self._list_accounts()}
+    account_id = self._account_id_by_name.get(name)
+    if account_id is None:
       raise ValueError(f"Счет с именем '{name}' не найден")
-    return match.iloc[0]["ID"]
+    return account_id
 
 
 class MarketDataService:
@@ -71,16 +241,122 @@ class MarketDataService:
     "1mo": CandleInterval.CANDLE_INTERVAL_MONTH,
   }
 
+  _INSTRUMENT_KINDS = {
+    "share": InstrumentType.INSTRUMENT_TYPE_SHARE,
+    "bond": InstrumentType.INSTRUMENT_TYPE_BOND,
+  }
+
   _FX_TICKERS = {
     ("USD", "RUB"): "USD000UTSTOM",
     ("EUR", "RUB"): "EUR_RUB__TOM",
   }
+  _FX_TTL = 60.0
+
+  _MAX_RANGE = {
+    "1m": timedelta(days=1),
+    "5m": timedelta(days=7),
+    "15m": timedelta(days=30),
+    "1h": timedelta(days=30),
+    "1d": timedelta(days=365),
+    "1w": timedelta(days=365 * 5),
+    "1mo": timedelta(days=365 * 10),
+  }
 
-  def __init__(self, token: str):
-    self.token = token
+  _HISTORY_WORKERS = 8
+  _BOND_WORKERS = 16
+  _PRICE_STREAM_SERVICES = weakref.WeakSet()
+  _MARKET_DATA_RPS = 300
+
+  _CACHE_PATH = Path.home() / ".cache" / "tinkoff_client" / "instruments.pkl"
+
+  def __init__(self, client: Services, cache_ttl: timedelta | None = None,
+    channels: list[Services] | None = None, rate_limiter: RateLimiter | None = None,
+    dtype_backend: str | None = None):
+    self.client = client
+    self._dtype_backend = dtype_backend
+    self._channels = cycle(channels or [client])
+    self._rate_limiter = rate_limiter or RateLimiter(self._MARKET_DATA_RPS)
+    self._figi_by_ticker: dict[str, dict[str, str]] = {kind: {} for kind in self._INSTRUMENT_KINDS}
+    self._ticker_by_figi: dict[str, str] = {}
+    self._instruments_loaded = False
+    self._cache_ttl = cache_ttl
+    self._fx_cache: dict[tuple[str, str], tuple[float, float]] = {}
+    self._streamed_prices: dict[str, Decimal] = {}
+    self._price_stream = None
+    self._lock = threading.RLock()
+
+  def _read_instrument_cache(self) -> dict[str, dict[str, str]] | None:
+    if self._cache_ttl is None:
+      return None
+    try:
+      age = time.time() - self._CACHE_PATH.stat().st_mtime
+      if age > self._cache_ttl.total_seconds():
+        return None
+      with open(self._CACHE_PATH, "rb") as f:
+        figi_by_ticker = pickle.load(f)
+    except Exception:
+      return None
+    if not isinstance(figi_by_ticker, dict) or figi_by_ticker.keys() != self._INSTRUMENT_KINDS.keys():
+      return None
+    return figi_by_ticker
+
+  def _write_instrument_cache(self, figi_by_ticker: dict[str, dict[str, str]]):
+    if self._cache_ttl is None:
+      return
+    try:
+      self._CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+      tmp_path = self._CACHE_PATH.with_suffix(".tmp")
+      with open(tmp_path, "wb") as f:
+        pickle.dump(figi_by_ticker, f)
+      tmp_path.replace(self._CACHE_PATH)
+    except OSError:
+      pass
+
+  def _load_instrument_cache(self):
+    with self._lock:
+      if self._instruments_loaded:
+        return
+      figi_by_ticker = self._read_instrument_cache()
+      if figi_by_ticker is None:
+        shares = self.client.instruments.shares(
+          instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE
+        ).instruments
+        bonds = self.client.instruments.bonds(
+          instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE
+        ).instruments
+        figi_by_ticker = {
+          "share": {i.ticker.upper(): i.figi for i in shares},
+          "bond": {i.ticker.upper(): i.figi for i in bonds},
+        }
+        self._write_instrument_cache(figi_by_ticker)
+      for kind, figis in figi_by_ticker.items():
+        self._figi_by_ticker[kind].update(figis)
+        for ticker, figi in figis.items():
+          self._ticker_by_figi[figi] = ticker
+      self._instruments_loaded = True
+
+  def refresh_instruments(self):
+    with self._lock:
+      if self._cache_ttl is not None:
+        self._CACHE_PATH.unlink(missing_ok=True)
+      self._figi_by_ticker = {kind: {} for kind in self._INSTRUMENT_KINDS}
+      self._ticker_by_figi = {}
+      self._instruments_loaded = False
+      self._load_instrument_cache()
 
   def _money_to_float(self, m):
-    return float(m.units + m.nano / 1e9) if m else 0.0
+    return m.units + m.nano * 1e-9 if m else 0.0
+
+  def _to_backend(self, df: pd.DataFrame) -> pd.DataFrame:
+    if self._dtype_backend is None:
+      return df
+    converted = df.convert_dtypes(dtype_backend=self._dtype_backend, convert_integer=False)
+    int_dtype = "int64[pyarrow]" if self._dtype_backend == "pyarrow" else "Int64"
+    return converted.astype({column: int_dtype for column in df.select_dtypes(include="integer").columns})
+
+  @staticmethod
+  def _safe_date(value):
+    return value.date() if value is not None else None
     
   def convert_currency(self, from_currency: str, to_currency: str, amount: float | None = None) -> float:
     from_currency = from_currency.upper()
@@ -93,10 +369,14 @@ class MarketDataService:
     if not ticker:
       raise ValueError(f"Нет валютной пары {from_currency}/{to_currency}")
 
-    with Client(self.token) as client:
-      instrument = client.instruments.find_instrument(query=ticker).instruments[0]
-      price = client.market_data.get_last_prices(figi=[instrument.figi]).last_prices[0]
+    cached = self._fx_cache.get((from_currency, to_currency))
+    if cached is not None and cached[1] > time.monotonic():
+      rate = cached[0]
+    else:
+      instrument = self.client.instruments.find_instrument(query=ticker).instruments[0]
+      price = self.client.market_data.get_last_prices(figi=[instrument.figi]).last_prices[0]
       rate = self._money_to_float(price.price)
+      self._fx_cache[(from_currency, to_currency)] = (rate, time.monotonic() + self._FX_TTL)
 
     if amount is not None:
       return amount * rate
@@ -104,173 +384,341 @@ class MarketDataService:
 
   def get_figi(self, ticker: str, instrument_type: str = "share") -> str:
     ticker = ticker.upper()
-    with Client(self.token) as client:
-      if instrument_type.lower() == "share":
-        instruments = client.instruments.shares(
-          instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE
-        ).instruments
-        inst = next((i for i in instruments if i.ticker == ticker), None)
-      elif instrument_type.lower() == "bond":
-        instruments = client.instruments.find_instrument(query=ticker).instruments 
-        inst = next((i for i in instruments if i.instrument_kind == InstrumentType.INSTRUMENT_TYPE_BOND), None)
-    if not inst:
+    instrument_type = instrument_type.lower()
+    if instrument_type not in self._INSTRUMENT_KINDS:
       raise ValueError(f"FIGI для '{ticker}' с типом '{instrument_type}' не найдено")
+
+    if not self._instruments_loaded:
+      self._load_instrument_cache()
+    figi = self._figi_by_ticker[instrument_type].get(ticker)
+    if figi is None:
+      figi = self._find_figi(ticker, instrument_type)
+    if not figi:
+      raise ValueError(f"FIGI для '{ticker}' с типом '{instrument_type}' не найдено")
+    return figi
+
+  def _find_figi(self, ticker: str, instrument_type: str) -> str | None:
+    kind = self._INSTRUMENT_KINDS[instrument_type]
+    instruments = self.client.instruments.find_instrument(query=ticker, instrument_kind=kind).instruments
+    matches = {i.ticker.upper(): i for i in instruments if i.instrument_kind == kind}
+    inst = matches.get(ticker)
+    if inst is None and instrument_type == "bond":
+      inst = next(iter(matches.values()), None)
+    if inst is None:
+      return None
+    self._figi_by_ticker[instrument_type][ticker] = inst.figi
+    self._ticker_by_figi.setdefault(inst.figi, inst.ticker)
     return inst.figi
 
-  
   def get_ticker(self, figi: str) -> str:
     if not figi:
       return None
-    with Client(self.token) as client:
-      instr = client.instruments.get_instrument_by(
-        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
-        id=figi
-      ).instrument
+    if figi in self._ticker_by_figi:
+      return self._ticker_by_figi[figi]
+    instr = self.client.instruments.get_instrument_by(
+      id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
+      id=figi
+    ).instrument
 
     if not instr or not instr.ticker:
       raise ValueError(f"Инструмент с FIGI {figi} не найден или тикер отсутствует")
+    self._ticker_by_figi[figi] = instr.ticker
     return instr.ticker
 
-  def get_current_price(self, ticker: str) -> float:
-    figi = self.get_figi(ticker)
-    with Client(self.token) as client:
-      orderbook = client.market_data.get_order_book(
-        figi=figi,
-        depth=1  
-      )
+  def get_tickers(self, figis) -> dict[str, str]:
+    unique_figis = {f for f in figis if f}
+    if not self._instruments_loaded and unique_figis - self._ticker_by_figi.keys():
+      self._load_instrument_cache()
+    return {f: self.get_ticker(f) for f in unique_figis}
+
+  def get_figis(self, tickers, instrument_type: str = "share") -> dict[str, str]:
+    if not self._instruments_loaded:
+      self._load_instrument_cache()
+    figi_by_ticker = self._figi_by_ticker.get(instrument_type.lower(), {})
+    result = {}
+    for ticker in set(tickers):
+      figi = figi_by_ticker.get(ticker.upper())
+      result[ticker] = figi if figi is not None else self.get_figi(ticker, instrument_type)
+    return result
+
+  def get_last_prices(self, figis: list[str]) -> dict[str, float]:
+    if not figis:
+      return {}
+    last_prices = self.client.market_data.get_last_prices(figi=list(figis)).last_prices
+    return {lp.figi: self._money_to_float(lp.price) for lp in last_prices if lp.price.units or lp.price.nano}
+
+  @staticmethod
+  def _order_book_price(orderbook, ticker: str) -> Decimal:
     if orderbook.last_price is not None:
-      return float(quotation_to_decimal(orderbook.last_price))
-    
-    bid_price = quotation_to_decimal(orderbook.bids[0].price) if orderbook.bids else None
-    ask_price = quotation_to_decimal(orderbook.asks[0].price) if orderbook.asks else None
-
-    if bid_price is not None and ask_price is not None:
-      return float((bid_price + ask_price) / 2)
-    elif bid_price is not None:
-      return float(bid_price)
-    elif ask_price is not None:
-      return float(ask_price)
-    else:
+      return quotation_to_decimal(orderbook.last_price)
+
+    prices = [quotation_to_decimal(side[0].price) for side in (orderbook.bids, orderbook.asks) if side]
+    if not prices:
       raise ValueError(f"Невозможно получить текущую цену для '{ticker}'")
-  
-  def get_history(self, ticker: str, from_date: datetime,
-    to_date: datetime, interval: str = "1d") -> pd.DataFrame:
+    return sum(prices) / len(prices)
 
-    figi = self.get_figi(ticker)
+  def get_current_price(self, ticker: str) -> Decimal:
+    return self.get_current_price_by_figi(self.get_figi(ticker), ticker)
 
-    if interval not in self._INTERVAL_MAP:
+  def get_current_price_by_figi(self, figi: str, label: str | None = None) -> Decimal:
+    price = self._streamed_prices.get(figi)
+    if price is not None:
+      return price
+    orderbook = self.client.market_data.get_order_book(
+      figi=figi,
+      depth=1  
+    )
+    return self._order_book_price(orderbook, label or figi)
+
+  def subscribe_prices(self, tickers):
+    instruments = [LastPriceInstrument(figi=self.get_figi(ticker)) for ticker in tickers]
+    with self._lock:
+      if self._price_stream is None:
+        self._price_stream = self.client.create_market_data_stream()
+        self._PRICE_STREAM_SERVICES.add(self)
+        threading.Thread(target=self._consume_prices, args=(self._price_stream,), daemon=True).start()
+      self._price_stream.last_price.subscribe(instruments)
+
+  def _consume_prices(self, stream):
+    try:
+      for response in stream:
+        if response.last_price is None:
+          continue
+        price = quotation_to_decimal(response.last_price.price)
+        with self._lock:
+          if self._price_stream is not stream:
+            break
+          self._streamed_prices[response.last_price.figi] = price
+    except Exception as e:
+      if self._price_stream is stream:
+        print(f"Поток последних цен остановлен: {e}")
+    finally:
+      with self._lock:
+        if self._price_stream is stream:
+          self._price_stream = None
+          self._streamed_prices.clear()
+
+  def stop_price_stream(self):
+    with self._lock:
+      stream, self._price_stream = self._price_stream, None
+      self._streamed_prices.clear()
+      self._PRICE_STREAM_SERVICES.discard(self)
+    if stream is not None:
+      stream.stop()
+
+  @classmethod
+  def stop_all_price_streams(cls):
+    for service in list(cls._PRICE_STREAM_SERVICES):
+      service.stop_price_stream()
+
+  @classmethod
+  def _history_ranges(cls, from_date: datetime, to_date: datetime, interval: str) -> list:
+    import pandas as pd
+    if interval not in cls._INTERVAL_MAP:
       raise ValueError(
         f"Interval '{interval}' не поддерживается. "
-        f"Доступные: {list(self._INTERVAL_MAP.keys())}"
+        f"Доступные: {list(cls._INTERVAL_MAP.keys())}"
       )
 
-    ti_interval = self._INTERVAL_MAP[interval]
-
-    max_range = {
-      "1m": timedelta(days=1),
-      "5m": timedelta(days=7),
-      "15m": timedelta(days=30),
-      "1h": timedelta(days=30),
-      "1d": timedelta(days=365),
-      "1w": timedelta(days=365 * 5),
-      "1mo": timedelta(days=365 * 10),
-    }
-
-    step = max_range.get(interval)
-
-    all_rows = []
-
-    cur_from = from_date
-
-    with Client(self.token) as client:
-      while cur_from < to_date:
-        cur_to = min(cur_from + step, to_date)
-
-        candles = client.market_data.get_candles(
-          figi=figi,
-          from_=cur_from,
-          to=cur_to,
-          interval=ti_interval,
-        ).candles
-
-        for c in candles:
-          all_rows.append({
-            "time": c.time,
-            "open": float(c.open.units + c.open.nano / 1e9),
-            "high": float(c.high.units + c.high.nano / 1e9),
-            "low": float(c.low.units + c.low.nano / 1e9),
-            "close": float(c.close.units + c.close.nano / 1e9),
-            "volume": c.volume,
-          })
+    if from_date >= to_date:
+      return []
+
+    edges = list(pd.date_range(from_date, to_date, freq=cls._MAX_RANGE[interval]).to_pydatetime())
+    if edges[-1] < to_date:
+      edges.append(to_date)
+    return list(zip(edges[:-1], edges[1:]))
+
+  @staticmethod
+  def _quotations_to_array(quotations, count: int | None = None) -> np.ndarray:
+    quotations = list(quotations)
+    count = len(quotations) if count is None else count
+    units = np.fromiter((q.units if q else 0 for q in quotations), dtype="int64", count=count)
+    nanos = np.fromiter((q.nano if q else 0 for q in quotations), dtype="int32", count=count)
+    return units + nanos * 1e-9
+
+  @staticmethod
+  def _dedup_chunks(chunks):
+    last_time = None
+    for chunk in chunks:
+      if last_time is not None:
+        start = 0
+        while start < len(chunk) and chunk[start].time <= last_time:
+          start += 1
+        chunk = chunk[start:]
+      if chunk:
+        last_time = chunk[-1].time
+        yield chunk
+
+  @classmethod
+  def _candles_to_frame(cls, candles) -> pd.DataFrame:
+    import pandas as pd
+    n = len(candles)
+    return pd.DataFrame({
+      "time": pd.to_datetime([c.time for c in candles], utc=True),
+      "open": cls._quotations_to_array((c.open for c in candles), n),
+      "high": cls._quotations_to_array((c.high for c in candles), n),
+      "low": cls._quotations_to_array((c.low for c in candles), n),
+      "close": cls._quotations_to_array((c.close for c in candles), n),
+      "volume": np.fromiter((c.volume for c in candles), dtype="int64", count=n),
+    })
+  
+  def _fetch_candle_chunks(self, figi: str, ranges: list, ti_interval: CandleInterval):
+    def fetch(date_range):
+      self._rate_limiter.acquire()
+      return next(self._channels).market_data.get_candles(
+        figi=figi,
+        from_=date_range[0],
+        to=date_range[1],
+        interval=ti_interval,
+      ).candles
+
+    ranges = iter(ranges)
+    with ThreadPoolExecutor(max_workers=self._HISTORY_WORKERS) as executor:
+      pending = deque(executor.submit(fetch, r) for r in islice(ranges, self._HISTORY_WORKERS))
+      while pending:
+        candles = pending.popleft().result()
+        next_range = next(ranges, None)
+        if next_range is not None:
+          pending.append(executor.submit(fetch, next_range))
+        yield candles
+
+  def iter_history(self, ticker: str, from_date: datetime,
+    to_date: datetime, interval: str = "1d"):
 
-        cur_from = cur_to
+    figi = self.get_figi(ticker)
+    ranges = self._history_ranges(from_date, to_date, interval)
+    chunks = self._fetch_candle_chunks(figi, ranges, self._INTERVAL_MAP[interval])
+    for candles in self._dedup_chunks(chunks):
+      yield self._to_backend(self._candles_to_frame(candles))
 
-    if not all_rows:
-      return pd.DataFrame(
-        columns=["time", "open", "high", "low", "close", "volume"]
-    )
+  def get_history(self, ticker: str, from_date: datetime,
+    to_date: datetime, interval: str = "1d") -> pd.DataFrame:
+    import pandas as pd
 
-    return (
-      pd.DataFrame(all_rows)
-      .drop_duplicates(subset="time")
-      .sort_values("time")
-      .reset_index(drop=True)
-    )
+    frames = list(self.iter_history(ticker, from_date, to_date, interval))
+    if not frames:
+      return self._to_backend(self._candles_to_frame([]))
+    return pd.concat(frames, ignore_index=True)
   
-  def bond_info(self, ticker: str) -> dict:
-    figi = self.get_figi(ticker, "bond")
-    monthly_coupon = 0.0
-    coupon_currency = None
-
-    with Client(self.token) as client:
-      bond = client.instruments.bond_by(
-        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
-        id=figi
-      ).instrument
-      coupons = client.instruments.get_bond_coupons(figi=figi).events
-    
+  @staticmethod
+  def _last_coupon(coupons):
     valid_coupons = [
       c for c in coupons
       if getattr(c, "pay_one_bond", None) and
       (getattr(c.pay_one_bond, "units", 0) != 0 or getattr(c.pay_one_bond, "nano", 0) != 0)
     ]
+    return max(valid_coupons, key=lambda x: x.coupon_date) if valid_coupons else None
 
-    if valid_coupons:
-      last_coupon = max(valid_coupons, key=lambda x: x.coupon_date)
-      coupon_currency = last_coupon.pay_one_bond.currency
-
-      coupon_quantity = getattr(bond, "coupon_quantity_per_year", 0)
-      if coupon_currency == "RUB":
-        coupon_amount = self._money_to_float(last_coupon.pay_one_bond)
-      else:
-        coupon_amount = self.convert_currency(coupon_currency, "RUB", self._money_to_float(last_coupon.pay_one_bond))
+  def _bond_record(self, bond, last_coupon, fx_rates: dict[str, float]) -> dict:
+    monthly_coupon = 0.0
+    coupon_currency = None
 
+    if last_coupon is not None:
+      coupon_currency = last_coupon.pay_one_bond.currency
+      coupon_quantity = bond.coupon_quantity_per_year
+      coupon_amount = self._money_to_float(last_coupon.pay_one_bond) * fx_rates[coupon_currency]
       monthly_coupon = coupon_amount * coupon_quantity / 12
 
     return {
-        "ticker": getattr(bond, "ticker", None),
-        "name": getattr(bond, "name", None),
-        "bond_currency": getattr(bond, "currency", None),
-        "nominal_currency": getattr(getattr(bond, "nominal", None), "currency", None),
+        "ticker": bond.ticker,
+        "name": bond.name,
+        "bond_currency": bond.currency,
+        "nominal_currency": bond.nominal.currency if bond.nominal else None,
         "coupon_currency": coupon_currency,
-        "nominal": self._money_to_float(getattr(bond, "nominal", None)),
-        "initial_nominal": self._money_to_float(getattr(bond, "initial_nominal", None)),
-        "aci_value": self._money_to_float(getattr(bond, "aci_value", None)),
+        "nominal": self._money_to_float(bond.nominal),
+        "initial_nominal": self._money_to_float(bond.initial_nominal),
+        "aci_value": self._money_to_float(bond.aci_value),
         "monthly_coupon": monthly_coupon,
-        "coupon_quantity_per_year": getattr(bond, "coupon_quantity_per_year", None),
-        "maturity_date": getattr(getattr(bond, "maturity_date", None), "date", lambda: None)(),
-        "placement_date": getattr(getattr(bond, "placement_date", None), "date", lambda: None)(),
-        "floating_coupon": getattr(bond, "floating_coupon_flag", None),
-        "amortization": getattr(bond, "amortization_flag", None),
+        "coupon_quantity_per_year": bond.coupon_quantity_per_year,
+        "maturity_date": self._safe_date(bond.maturity_date),
+        "placement_date": self._safe_date(bond.placement_date),
+        "floating_coupon": bond.floating_coupon_flag,
+        "amortization": bond.amortization_flag,
     }
+
+  def bond_info(self, ticker: str) -> dict:
+    return self.bond_info_by_figi(self.get_figi(ticker, "bond"))
+
+  def bond_info_by_figi(self, figi: str) -> dict:
+    bond = self.client.instruments.bond_by(
+      id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
+      id=figi
+    ).instrument
+    last_coupon = self._last_coupon(self.client.instruments.get_bond_coupons(figi=figi).events)
+
+    fx_rates = {}
+    if last_coupon is not None:
+      currency = last_coupon.pay_one_bond.currency
+      fx_rates[currency] = self.convert_currency(currency, "RUB")
+    return self._bond_record(bond, last_coupon, fx_rates)
+
+  def bond_info_batch(self, tickers) -> list[dict | None]:
+    figis = []
+    for ticker in tickers:
+      try:
+        figis.append(self.get_figi(ticker, "bond"))
+      except ValueError as e:
+        print(f"Ошибка при получении данных для {ticker}: {e}")
+        figis.append(None)
+    return self.bond_info_batch_by_figi(figis)
+
+  def bond_info_batch_by_figi(self, figis) -> list[dict | None]:
+    figis = list(figis)
+    if not figis:
+      return []
+
+    def limited(method, **kwargs):
+      self._rate_limiter.acquire()
+      return method(**kwargs)
+
+    unique_figis = {figi for figi in figis if figi}
+    workers = max(min(2 * len(unique_figis), self._BOND_WORKERS), 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      futures = {
+        figi: (
+          executor.submit(
+            limited,
+            self.client.instruments.bond_by,
+            id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
+            id=figi,
+          ),
+          executor.submit(limited, self.client.instruments.get_bond_coupons, figi=figi),
+        )
+        for figi in unique_figis
+      }
+
+    fetched = {}
+    for figi, (bond_future, coupons_future) in futures.items():
+      try:
+        fetched[figi] = (
+          bond_future.result().instrument,
+          self._last_coupon(coupons_future.result().events),
+        )
+      except Exception as e:
+        print(f"Ошибка при получении данных для {self._ticker_by_figi.get(figi, figi)}: {e}")
+
+    fx_rates = {}
+    for currency in {c.pay_one_bond.currency for _, c in fetched.values() if c is not None}:
+      try:
+        fx_rates[currency] = self.convert_currency(currency, "RUB")
+      except Exception as e:
+        print(f"Ошибка при получении курса {currency}: {e}")
+
+    records = []
+    for figi in figis:
+      bond, last_coupon = fetched.get(figi, (None, None))
+      if bond is None or (last_coupon is not None and last_coupon.pay_one_bond.currency not in fx_rates):
+        records.append(None)
+        continue
+      records.append(self._bond_record(bond, last_coupon, fx_rates))
+    return records
   
   def stock_info(self, ticker: str) -> dict:
     figi = self.get_figi(ticker, "share")
-    with Client(self.token) as client:
-      stock = client.instruments.share_by(
-        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
-        id=figi
-      ).instrument
+    stock = self.client.instruments.share_by(
+      id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
+      id=figi
+    ).instrument
     print(stock)
     return {
         "ticker": getattr(stock, "ticker", None),
@@ -285,17 +733,95 @@ class MarketDataService:
 
 class TradeService:
 
-  def __init__(self, token: str, account_service: AccountService, market_data_service: MarketDataService):
-    self.token = token
+  _DIRECTION_MAP = {
+    "BUY": OrderDirection.ORDER_DIRECTION_BUY,
+    "SELL": OrderDirection.ORDER_DIRECTION_SELL,
+  }
+
+  _STOP_TYPE = {
+    "STOP_LOSS": StopOrderType.STOP_ORDER_TYPE_STOP_LOSS,
+    "TAKE_PROFIT": StopOrderType.STOP_ORDER_TYPE_TAKE_PROFIT,
+  }
+
+  _STOP_DIR = {
+    "SELL": StopOrderDirection.STOP_ORDER_DIRECTION_SELL,
+    "BUY": StopOrderDirection.STOP_ORDER_DIRECTION_BUY,
+  }
+
+  _STOP_ORDER_SIDES = {
+    ("long", "SL"): ("SELL", "STOP_LOSS"),
+    ("long", "TP"): ("SELL", "TAKE_PROFIT"),
+    ("short", "SL"): ("BUY", "STOP_LOSS"),
+    ("short", "TP"): ("BUY", "TAKE_PROFIT"),
+  }
+
+  _ORDERS_RPS = 100
+  _ORDER_WORKERS = 16
+
+  _RESOLVE_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+  def __init__(self, client: Services, account_service: AccountService, market_data_service: MarketDataService,
+    channels: list[Services] | None = None, rate_limiter: RateLimiter | None = None):
+    self.client = client
     self.account_service = account_service
     self.market_data_service = market_data_service
+    self._channels = cycle(channels or [client])
+    self._rate_limiter = rate_limiter or RateLimiter(self._ORDERS_RPS)
+
+  def resolve(self, account: str, ticker: str) -> tuple[str, str]:
+    account_future = self._RESOLVE_EXECUTOR.submit(self.account_service.get_account_id, account)
+    figi = self.market_data_service.get_figi(ticker)
+    return account_future.result(), figi
+
+  @staticmethod
+  def _to_quotation(price: float | Decimal | int) -> Quotation:
+    if isinstance(price, int):
+      return Quotation(units=price, nano=0)
+    return TradeService._price_to_quotation(str(price))
+
+  @staticmethod
+  @lru_cache(maxsize=4096)
+  def _price_to_quotation(price_repr: str) -> Quotation:
+    return decimal_to_quotation(Decimal(price_repr))
   
+  @staticmethod
+  def _check_order(quantity: int, price: float | Decimal | None):
+    if quantity <= 0:
+      raise ValueError("Количество должно быть положительным.")
+    if price is not None and price <= 0:
+      raise ValueError("Цена должна быть положительной")
+
+  @classmethod
+  def _check_specs(cls, specs: list[dict]):
+    for spec in specs:
+      cls._check_order(spec["quantity"], spec.get("price"))
+      if spec["direction"].upper() not in cls._DIRECTION_MAP:
+        raise ValueError("direction должен быть 'BUY' или 'SELL'")
+
+  @classmethod
+  def _check_bracket(cls, quantity: int, stop_price: float, take_price: float,
+    entry_price: float | None, direction: str):
+    if direction not in cls._DIRECTION_MAP:
+      raise ValueError("direction должен быть 'BUY' или 'SELL'")
+    cls._check_order(quantity, entry_price)
+    for price in (stop_price, take_price):
+      if price is None:
+        raise ValueError("Цена должна быть положительной")
+      cls._check_order(quantity, price)
+
+  @staticmethod
+  def _bracket_error(errors: dict, live: dict) -> RuntimeError:
+    failed = ", ".join(f"{leg}: {e}" for leg, e in errors.items())
+    message = f"Не удалось выставить связку ордеров ({failed}), выставленные части отменены"
+    if live:
+      message += f"; не удалось отменить: {live}"
+    return RuntimeError(message)
+
   def _place_order( self, account: str, figi: str,
     quantity: int, direction: OrderDirection,
-    price: float | None):
+    price: float | Decimal | None, client: Services | None = None):
 
-    if quantity <= 0:
-      raise ValueError("Количество должно быть положительным.")
+    self._check_order(quantity, price)
 
     order_type = (
       OrderType.ORDER_TYPE_MARKET
@@ -303,26 +829,20 @@ class TradeService:
       else OrderType.ORDER_TYPE_LIMIT
     )
 
-    price_q = None
-    if price is not None:
-      if price <= 0:
-          raise ValueError("Цена должна быть положительной")
-      price_q = decimal_to_quotation(price)
+    price_q = None if price is None else self._to_quotation(price)
 
-    with Client(self.token) as client:
-      order = client.orders.post_order(
-        figi=figi,
-        quantity=quantity,
-        account_id=account,
-        direction=direction,
-        order_type=order_type,
-        price=price_q,
-      )
+    self._rate_limiter.acquire()
+    order = (client or self.client).orders.post_order(
+      figi=figi,
+      quantity=quantity,
+      account_id=account,
+      direction=direction,
+      order_type=order_type,
+      price=price_q,
+    )
     return order
 
-  def buy(self, account: str, ticker: str, quantity: int, price: float = None):
-    account_id = self.account_service.get_account_id(account)
-    figi = self.market_data_service.get_figi(ticker)
+  def buy_resolved(self, account_id: str, figi: str, quantity: int, price: float = None):
     order = self._place_order(
       account=account_id,
       figi=figi,
@@ -330,12 +850,9 @@ class TradeService:
       direction=OrderDirection.ORDER_DIRECTION_BUY,
       price=price,
     )
-
     return order.order_id
-    
-  def sell(self, account: str, ticker: str, quantity: int, price: float = None):
-    account_id = self.account_service.get_account_id(account)
-    figi = self.market_data_service.get_figi(ticker)
+
+  def sell_resolved(self, account_id: str, figi: str, quantity: int, price: float = None):
     order = self._place_order(
       account=account_id,
       figi=figi,
@@ -343,73 +860,150 @@ class TradeService:
       direction=OrderDirection.ORDER_DIRECTION_SELL,
       price=price,
     )
+    return order.order_id
 
-    return  order.order_id
+  def buy(self, account: str, ticker: str, quantity: int, price: float = None):
+    return self.buy_resolved(*self.resolve(account, ticker), quantity, price)
+    
+  def sell(self, account: str, ticker: str, quantity: int, price: float = None):
+    return self.sell_resolved(*self.resolve(account, ticker), quantity, price)
   
+  def place_orders(self, specs: list[dict]) -> list[str | Exception]:
+    if not specs:
+      return []
+    self._check_specs(specs)
+
+    account_ids = {
+      name: self.account_service.get_account_id(name)
+      for name in {s["account"] for s in specs}
+    }
+    figis = self.market_data_service.get_figis(s["ticker"] for s in specs)
+
+    def place(spec):
+      try:
+        return self._place_order(
+          account=account_ids[spec["account"]],
+          figi=figis[spec["ticker"]],
+          quantity=spec["quantity"],
+          direction=self._DIRECTION_MAP[spec["direction"].upper()],
+          price=spec.get("price"),
+          client=next(self._channels),
+        ).order_id
+      except Exception as e:
+        return e
+
+    with ThreadPoolExecutor(max_workers=min(len(specs), self._ORDER_WORKERS)) as executor:
+      return list(executor.map(place, specs))
+
   def get_order_state(self, account: str, order_id: str) -> dict:
     account_id = self.account_service.get_account_id(account)
-    with Client(self.token) as client:
-      state = client.orders.get_order_state(
-        account_id=account_id,
-        order_id=order_id
-      )
+    return self._order_state(account_id, order_id)
+
+  def _order_state(self, account_id: str, order_id: str, client: Services | None = None) -> dict:
+    self._rate_limiter.acquire()
+    state = (client or self.client).orders.get_order_state(
+      account_id=account_id,
+      order_id=order_id
+    )
     return {
       "order_id": order_id,
       "status": state.execution_report_status.name,
       "executed_lots": state.lots_executed,
       "price": (
-        float(quotation_to_decimal(state.executed_order_price))
+        quotation_to_decimal(state.executed_order_price)
         if state.executed_order_price else None
       )
     }
 
+  def get_order_states(self, account: str, order_ids: list[str]) -> list[dict]:
+    if not order_ids:
+      return []
+    account_id = self.account_service.get_account_id(account)
+    with ThreadPoolExecutor(max_workers=min(len(order_ids), self._ORDER_WORKERS)) as executor:
+      return list(executor.map(
+        lambda order_id: self._order_state(account_id, order_id, client=next(self._channels)),
+        order_ids,
+      ))
+
   def _place_stop_order(self, account_id: str, figi: str,
     quantity: int, stop_price: float, exec_price: float,
     direction: str, order_type: str) -> str:
-    stop_order_type_map = {
-      "STOP_LOSS": StopOrderType.STOP_ORDER_TYPE_STOP_LOSS,
-      "TAKE_PROFIT": StopOrderType.STOP_ORDER_TYPE_TAKE_PROFIT,
-    }
-    if order_type not in stop_order_type_map:
+    if order_type not in self._STOP_TYPE:
       raise ValueError("order_type должен быть 'STOP_LOSS' или 'TAKE_PROFIT'")
 
-    stop_q = decimal_to_quotation(Decimal(str(stop_price)))
-    exec_q = decimal_to_quotation(Decimal(str(exec_price)))
+    stop_q = self._to_quotation(stop_price)
+    exec_q = self._to_quotation(exec_price)
 
-    with Client(self.token) as client:
-      resp = client.stop_orders.post_stop_order(
-        account_id=account_id,
-        figi=figi,
-        quantity=quantity,
-        stop_price=stop_q,
-        price=exec_q,
-        direction=StopOrderDirection.STOP_ORDER_DIRECTION_SELL
-        if direction.upper() == "SELL"
-        else StopOrderDirection.STOP_ORDER_DIRECTION_BUY,
-        expiration_type=StopOrderExpirationType.STOP_ORDER_EXPIRATION_TYPE_GOOD_TILL_CANCEL,
-        stop_order_type=stop_order_type_map[order_type],
-      )
+    self._rate_limiter.acquire()
+    resp = self.client.stop_orders.post_stop_order(
+      account_id=account_id,
+      figi=figi,
+      quantity=quantity,
+      stop_price=stop_q,
+      price=exec_q,
+      direction=self._STOP_DIR[direction],
+      expiration_type=StopOrderExpirationType.STOP_ORDER_EXPIRATION_TYPE_GOOD_TILL_CANCEL,
+      stop_order_type=self._STOP_TYPE[order_type],
+    )
     return resp.stop_order_id
 
-  def long_stop_loss(self, account: str, ticker: str, stop_price: float, exec_price: float, quantity: int):
-    account_id = self.account_service.get_account_id(account)
-    figi = self.market_data_service.get_figi(ticker)
-    return self._place_stop_order(account_id, figi, quantity, stop_price, exec_price, "SELL", "STOP_LOSS")
-
-  def long_take_profit(self, account: str, ticker: str, stop_price: float, exec_price: float, quantity: int):
-    account_id = self.account_service.get_account_id(account)
-    figi = self.market_data_service.get_figi(ticker)
-    return self._place_stop_order(account_id, figi, quantity, stop_price, exec_price, "SELL", "TAKE_PROFIT")
+  def stop_order(self, account: str, ticker: str, stop_price: float, exec_price: float, quantity: int,
+    *, side: str, kind: str):
+    if (side, kind) not in self._STOP_ORDER_SIDES:
+      raise ValueError("side должен быть 'long' или 'short', kind — 'SL' или 'TP'")
+    direction, order_type = self._STOP_ORDER_SIDES[(side, kind)]
+    account_id, figi = self.resolve(account, ticker)
+    return self._place_stop_order(account_id, figi, quantity, stop_price, exec_price, direction, order_type)
+
+  long_stop_loss = partialmethod(stop_order, side="long", kind="SL")
+  long_take_profit = partialmethod(stop_order, side="long", kind="TP")
+  short_stop_loss = partialmethod(stop_order, side="short", kind="SL")
+  short_take_profit = partialmethod(stop_order, side="short", kind="TP")
+
+  def bracket_order(self, account: str, ticker: str, quantity: int, stop_price: float, take_price: float,
+    entry_price: float | None = None, direction: str = "BUY") -> dict:
+    direction = direction.upper()
+    self._check_bracket(quantity, stop_price, take_price, entry_price, direction)
+    exit_direction = "SELL" if direction == "BUY" else "BUY"
+    account_id, figi = self.resolve(account, ticker)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+      legs = {
+        "order_id": executor.submit(
+          lambda: self._place_order(account_id, figi, quantity, self._DIRECTION_MAP[direction], entry_price).order_id,
+        ),
+        "stop_order_id": executor.submit(
+          self._place_stop_order, account_id, figi, quantity, stop_price, stop_price, exit_direction, "STOP_LOSS",
+        ),
+        "tp_order_id": executor.submit(
+          self._place_stop_order, account_id, figi, quantity, take_price, take_price, exit_direction, "TAKE_PROFIT",
+        ),
+      }
+
+    placed, errors = {}, {}
+    for leg, future in legs.items():
+      try:
+        placed[leg] = future.result()
+      except Exception as e:
+        errors[leg] = e
+    if not errors:
+      return placed
 
-  def short_stop_loss(self, account: str, ticker: str, stop_price: float, exec_price: float, quantity: int):
-    account_id = self.account_service.get_account_id(account)
-    figi = self.market_data_service.get_figi(ticker)
-    return self._place_stop_order(account_id, figi, quantity, stop_price, exec_price, "BUY", "STOP_LOSS")
+    live = self._cancel_legs(account_id, placed)
+    raise self._bracket_error(errors, live) from next(iter(errors.values()))
 
-  def short_take_profit(self, account: str, ticker: str, stop_price: float, exec_price: float, quantity: int):
-    account_id = self.account_service.get_account_id(account)
-    figi = self.market_data_service.get_figi(ticker)
-    return self._place_stop_order(account_id, figi, quantity, stop_price, exec_price, "BUY", "TAKE_PROFIT")
+  def _cancel_legs(self, account_id: str, placed: dict) -> dict:
+    live = {}
+    for leg, order_id in placed.items():
+      try:
+        self._rate_limiter.acquire()
+        if leg == "order_id":
+          self.client.orders.cancel_order(account_id=account_id, order_id=order_id)
+        else:
+          self.client.stop_orders.cancel_stop_order(account_id=account_id, stop_order_id=order_id)
+      except Exception:
+        live[leg] = order_id
+    return live
 
 class PortfolioService:
   _OPERATION_TYPE_MAP = {
@@ -420,73 +1014,94 @@ class PortfolioService:
     "OPERATION_TYPE_OUT_MULTI": "WITHDRAW",
   }
 
-  def __init__(self, token: str, account_service: AccountService, market_data_service: MarketDataService):
-    self.token = token
+  _POSITIONS_TTL = 5.0
+  _OPERATIONS_PAGE_SIZE = 1000
+
+  def __init__(self, client: Services, account_service: AccountService, market_data_service: MarketDataService):
+    self.client = client
     self.account_service = account_service
     self.market_data_service = market_data_service
+    self._positions_cache: dict[str, tuple[float, pd.DataFrame]] = {}
+
+  def _positions_frame(self, account: str) -> pd.DataFrame:
+    cached = self._positions_cache.get(account)
+    if cached is not None and time.monotonic() - cached[0] < self._POSITIONS_TTL:
+      return cached[1]
+    df = self.get_positions(account)
+    self._positions_cache[account] = (time.monotonic(), df)
+    return df
 
-  def _quotation_to_float(self, q):
-    if q is None:
-      return 0.0
-    return float(quotation_to_decimal(q))
-    
   def get_positions(self, account: str) -> pd.DataFrame:
+    import pandas as pd
     account_id = self.account_service.get_account_id(account)
-    rows = []
-    with Client(self.token) as client:
-      portfolio = client.operations.get_portfolio(account_id=account_id)
-      for pos in portfolio.positions:
-        quantity = self._quotation_to_float(pos.quantity)
-        avg_price = self._quotation_to_float(pos.average_position_price)
-        current_price = self._quotation_to_float(pos.current_price)
-        expected_yield = self._quotation_to_float(pos.expected_yield)
-        return_pct = (
-          (current_price - avg_price) / avg_price * 100
-          if avg_price > 0 else 0.0
-        )
-
-        rows.append({
-          "figi": pos.figi,
-          "ticker": self.market_data_service.get_ticker(pos.figi) if pos.figi else None,
-          "instrument_type": pos.instrument_type,
-          "quantity": quantity,
-          "average_price": avg_price,
-          "current_price": current_price,
-          "expected_yield": expected_yield,
-          "return_pct": return_pct,
-        })
-
-    df = pd.DataFrame(rows)
+    portfolio = self.client.operations.get_portfolio(account_id=account_id)
+    positions = portfolio.positions
+    tickers = self.market_data_service.get_tickers(pos.figi for pos in positions)
+
+    avg_prices = MarketDataService._quotations_to_array(pos.average_position_price for pos in positions)
+    current_prices = MarketDataService._quotations_to_array(pos.current_price for pos in positions)
+    return_pct = np.divide(
+      current_prices - avg_prices, avg_prices,
+      out=np.zeros_like(avg_prices), where=avg_prices > 0,
+    ) * 100
+
+    df = pd.DataFrame({
+      "figi": [pos.figi for pos in positions],
+      "ticker": [tickers.get(pos.figi) for pos in positions],
+      "instrument_type": pd.Categorical([pos.instrument_type for pos in positions]),
+      "quantity": MarketDataService._quotations_to_array(pos.quantity for pos in positions),
+      "average_price": avg_prices,
+      "current_price": current_prices,
+      "expected_yield": MarketDataService._quotations_to_array(pos.expected_yield for pos in positions),
+      "return_pct": return_pct,
+    })
 
     if df.empty:
       return df
 
-    return df.sort_values("expected_yield", ascending=False).reset_index(drop=True)
+    df = df.sort_values("expected_yield", ascending=False).reset_index(drop=True)
+    return self.market_data_service._to_backend(df)
   
-  def get_operations_history(self, account: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+  def _operations_to_frame(self, ops) -> pd.DataFrame:
+    import pandas as pd
+    tickers = self.market_data_service.get_tickers(op.figi for op in ops)
+    return pd.DataFrame({
+      "time": pd.to_datetime([op.date for op in ops], utc=True),
+      "type": [self._OPERATION_TYPE_MAP.get(op.type.name) for op in ops],
+      "ticker": [tickers.get(op.figi) for op in ops],
+      "quantity": np.asarray([op.quantity for op in ops], dtype="int64"),
+      "price": MarketDataService._quotations_to_array(op.price for op in ops),
+      "payment": MarketDataService._quotations_to_array(op.payment for op in ops),
+    })
+
+  def iter_operations(self, account: str, from_date: datetime, to_date: datetime):
     account_id = self.account_service.get_account_id(account)
-
-    with Client(self.token) as client:
-      ops = client.operations.get_operations(
+    cursor = ""
+    while True:
+      page = self.client.operations.get_operations_by_cursor(GetOperationsByCursorRequest(
         account_id=account_id,
         from_=from_date,
         to=to_date,
-      ).operations
-
-    rows = []
-    for op in ops:
-      rows.append({
-        "time": op.date,
-        "type": self._OPERATION_TYPE_MAP.get(op.operation_type.name),
-        "ticker": self.market_data_service.get_ticker(op.figi) if op.figi else None,
-        "quantity": op.quantity,
-        "price": self._quotation_to_float(op.price),
-        "payment": self._quotation_to_float(op.payment),
-      })
-    return pd.DataFrame(rows).sort_values("time").reset_index(drop=True)
+        cursor=cursor,
+        limit=self._OPERATIONS_PAGE_SIZE,
+      ))
+      if page.items:
+        yield self._operations_to_frame(page.items)
+      if not page.has_next:
+        return
+      cursor = page.next_cursor
+
+  def get_operations_history(self, account: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+    import pandas as pd
+    frames = list(self.iter_operations(account, from_date, to_date))
+    df = pd.concat(frames, ignore_index=True) if frames else self._operations_to_frame([])
+    df["type"] = df["type"].astype("category")
+    df["ticker"] = df["ticker"].astype("category")
+    return self.market_data_service._to_backend(df.sort_values("time").reset_index(drop=True))
   
   def bonds(self, account: str) -> pd.DataFrame:
-    df = self.get_positions(account)
+    import pandas as pd
+    df = self._positions_frame(account)
     if df.empty:
       return df
     
@@ -497,35 +1112,33 @@ class PortfolioService:
         "monthly_coupon", "total_monthly_coupon", "coupon_yield_pct"
       ])
 
-    bond_info_list = []
-    for _, row in bond_positions.iterrows():
-      try:
-        info = self.market_data_service.bond_info(row['ticker'])
-        monthly_coupon_per_bond = info.get('monthly_coupon', 0.0)
-        nominal = info.get('nominal', 0.0)
-
-        bond_info_list.append({
-            "ticker": row['ticker'],
-            "name": info.get('name'),
-            "quantity": row['quantity'],
-            "average_price": row['average_price'],
-            "nominal": nominal,
-            "monthly_coupon": monthly_coupon_per_bond,
-        })
+    infos = self.market_data_service.bond_info_batch_by_figi(bond_positions['figi'])
 
-      except Exception as e:
-        print(f"Ошибка при получении данных для {row['ticker']}: {e}")
+    found = [info is not None for info in infos]
+    bond_positions = bond_positions[found]
+    infos = [info for info in infos if info is not None]
 
-    return pd.DataFrame(bond_info_list).sort_values("monthly_coupon", ascending=False).reset_index(drop=True)
+    df = pd.DataFrame({
+      "ticker": bond_positions['ticker'].to_numpy(),
+      "name": [info.get('name') for info in infos],
+      "quantity": bond_positions['quantity'].to_numpy(),
+      "average_price": bond_positions['average_price'].to_numpy(),
+      "nominal": np.asarray([info.get('nominal', 0.0) for info in infos], dtype="float64"),
+      "monthly_coupon": np.asarray([info.get('monthly_coupon', 0.0) for info in infos], dtype="float64"),
+    })
+    df = df.sort_values("monthly_coupon", ascending=False).reset_index(drop=True)
+    return self.market_data_service._to_backend(df)
 
   def bonds_summary(self, account: str):
+    from tabulate import tabulate
     df_bonds = self.bonds(account)
     if df_bonds.empty:
         print("Нет облигаций на этом счете.")
         return
     
-    total_invested = (df_bonds['quantity'] * df_bonds['average_price']).sum()
-    total_monthly_coupon = (df_bonds['quantity'] * df_bonds['monthly_coupon']).sum()
+    quantity = df_bonds['quantity'].to_numpy(dtype="float64")
+    total_invested = float(np.dot(quantity, df_bonds['average_price'].to_numpy(dtype="float64")))
+    total_monthly_coupon = float(np.dot(quantity, df_bonds['monthly_coupon'].to_numpy(dtype="float64")))
     annual_yield_pct = (total_monthly_coupon * 12 / total_invested * 100) if total_invested > 0 else 0.0
 
     summary_table = [
@@ -537,7 +1150,8 @@ class PortfolioService:
     print(tabulate(summary_table, headers=["Показатель", "Значение", "Ед. изм."], tablefmt="pretty"))
 
   def stocks(self, account: str) -> pd.DataFrame:
-    df = self.get_positions(account)
+    import pandas as pd
+    df = self._positions_frame(account)
     if df.empty:
         return df
 
@@ -548,37 +1162,45 @@ class PortfolioService:
         "unrealized_profit", "return_pct"
       ])
 
-    stock_info_list = []
-    for _, row in stock_positions.iterrows():
-      try:
-        current_price = self.market_data_service.get_current_price(row['ticker'])
-        quantity = row['quantity']
-        avg_price = row['average_price']
-        unrealized_profit = (current_price - avg_price) * quantity
-        return_pct = ((current_price - avg_price) / avg_price * 100) if avg_price > 0 else 0.0
-        stock_info_list.append({
-          "ticker": row['ticker'],
-          "name": row.get('ticker'), 
-          "quantity": quantity,
-          "average_price": avg_price,
-          "current_price": current_price,
-          "unrealized_profit": unrealized_profit,
-          "return_pct": return_pct,
-        })
-
-      except Exception as e:
-        print(f"Ошибка при получении данных для {row['ticker']}: {e}")
-
-    return pd.DataFrame(stock_info_list).sort_values("unrealized_profit", ascending=False).reset_index(drop=True)
+    prices = self.market_data_service.get_last_prices(stock_positions['figi'].tolist())
+    stock_positions['current_price'] = stock_positions['figi'].map(prices)
+
+    missing = stock_positions['current_price'].isna()
+    for ticker in stock_positions.loc[missing, 'ticker']:
+      print(f"Ошибка при получении данных для {ticker}: нет последней цены")
+    stock_positions = stock_positions[~missing]
+
+    quantity = stock_positions['quantity'].to_numpy()
+    avg_prices = stock_positions['average_price'].to_numpy(dtype="float64")
+    current_prices = stock_positions['current_price'].to_numpy(dtype="float64")
+    price_diff = current_prices - avg_prices
+
+    df_stocks = pd.DataFrame({
+      "ticker": stock_positions['ticker'].to_numpy(),
+      "name": stock_positions['ticker'].to_numpy(),
+      "quantity": quantity,
+      "average_price": avg_prices,
+      "current_price": current_prices,
+      "unrealized_profit": price_diff * quantity,
+      "return_pct": np.divide(
+        price_diff, avg_prices,
+        out=np.zeros_like(avg_prices), where=avg_prices > 0,
+      ) * 100,
+    })
+
+    df_stocks = df_stocks.sort_values("unrealized_profit", ascending=False).reset_index(drop=True)
+    return self.market_data_service._to_backend(df_stocks)
 
   def stocks_summary(self, account: str):
+    from tabulate import tabulate
     
     df_stocks = self.stocks(account)
     if df_stocks.empty:
         print("Нет акций на этом счете.")
         return
-    total_invested = (df_stocks['quantity'] * df_stocks['average_price']).sum()
-    total_current_value = (df_stocks['quantity'] * df_stocks['current_price']).sum()
+    quantity = df_stocks['quantity'].to_numpy(dtype="float64")
+    total_invested = float(np.dot(quantity, df_stocks['average_price'].to_numpy(dtype="float64")))
+    total_current_value = float(np.dot(quantity, df_stocks['current_price'].to_numpy(dtype="float64")))
     total_unrealized_profit = (total_current_value - total_invested)
     return_pct = (total_unrealized_profit / total_invested * 100) if total_invested > 0 else 0.0
 